@@ -0,0 +1,84 @@
+# benchmark of the pre-apply reachability verifier on a generated line topology
+# usage: python benchmarks/verifier_benchmark.py [--switches 10] [--hosts-per-switch 30]
+import argparse
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import verifier
+
+
+# generate a line of switches with hosts on ports 1..H and uplinks on ports H+1 (left) and H+2 (right)
+def build_topology(switches, hosts_per_switch):
+    ports, hosts = {}, {}
+    for dpid in range(1, switches + 1):
+        port_map = {}
+        for port in range(1, hosts_per_switch + 1):
+            n = (dpid - 1) * hosts_per_switch + port
+            port_map[str(port)] = f'h{n}'
+            hosts[f'h{n}'] = {'mac': f'02:00:00:00:{n // 256:02x}:{n % 256:02x}', 'ip': f'10.0.{n // 256}.{n % 256}'}
+        if dpid > 1:
+            port_map[str(hosts_per_switch + 1)] = f's{dpid - 1}'
+        if dpid < switches:
+            port_map[str(hosts_per_switch + 2)] = f's{dpid + 1}'
+        ports[f's{dpid}'] = port_map
+    return {'hosts': hosts, 'ports': ports}
+
+
+# snapshot with every mac learned on every switch (learned) or no mac learned yet (flooding)
+def build_state(topology, switches, hosts_per_switch, learned):
+    mac_table = {}
+    if learned:
+        for dpid in range(1, switches + 1):
+            table = mac_table[str(dpid)] = {}
+            for name, host in topology['hosts'].items():
+                n = int(name[1:])
+                home = (n - 1) // hosts_per_switch + 1
+                if home == dpid:
+                    table[host['mac']] = (n - 1) % hosts_per_switch + 1
+                else:
+                    table[host['mac']] = hosts_per_switch + 1 if home < dpid else hosts_per_switch + 2
+    return {'switches': list(range(1, switches + 1)), 'mac_table': mac_table}
+
+
+def run(label, actions, topology, state):
+    started = time.monotonic()
+    report = verifier.verify_actions(actions, topology, state)
+    wall_ms = (time.monotonic() - started) * 1000
+    baseline = report['baseline']
+    print(f"  {label:<38} baseline {baseline['kind']:<11} {baseline['destinations_recomputed']:>4} dst {baseline['elapsed_ms']:>8.1f} ms | "
+          f"verify {report['pairs_recomputed']:>6} pairs {report['elapsed_ms']:>8.1f} ms | total {wall_ms:>8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the reachability verifier')
+    parser.add_argument('--switches', type=int, default=10)
+    parser.add_argument('--hosts-per-switch', type=int, default=30)
+    args = parser.parse_args()
+
+    topology = build_topology(args.switches, args.hosts_per_switch)
+    macs = {name: host['mac'] for name, host in topology['hosts'].items()}
+    drop_rule = [{'action': 'install_flow', 'switch': 1, 'src_mac': macs['h1'], 'dst_mac': macs['h2'], 'actions': [], 'priority': 2}]
+    block_uplink = [{'action': 'block_port', 'switch': 1, 'port': args.hosts_per_switch + 2}]
+
+    print(f'{args.switches} switches x {args.hosts_per_switch} hosts ({len(macs)} hosts)')
+    for learned in (True, False):
+        print('learned MAC tables' if learned else 'empty MAC tables (flooding)')
+        state = build_state(topology, args.switches, args.hosts_per_switch, learned)
+        verifier.verifier_cache['verifier'] = None
+        run('first call, drop rule', drop_rule, topology, state)
+        run('same snapshot, drop rule', drop_rule, topology, state)
+        run('same snapshot, block uplink', block_uplink, topology, state)
+
+        # next snapshots: one flow added (only its destination changes), then a port down (every destination crossing it)
+        flow_added = copy.deepcopy(state)
+        flow_added['flow_tables'] = {'3': [{'priority': 2, 'match': {'eth_src': macs['h1'], 'eth_dst': macs['h60']}, 'actions': []}]}
+        run('new snapshot (flow added), drop rule', drop_rule, topology, flow_added)
+        port_down = copy.deepcopy(flow_added)
+        port_down['port_description_stats'] = {'5': [{'port_no': 3, 'config': 1, 'state': 0}]}
+        run('new snapshot (port down), drop rule', drop_rule, topology, port_down)
+
+if __name__ == '__main__':
+    main()
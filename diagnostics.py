@@ -0,0 +1,277 @@
+import glob
+import json
+import os
+import re
+
+import numpy as np
+
+
+# openflow / stplib constants used to interpret the snapshot
+OFPP_MAX = 0xffffff00       # port numbers above this are reserved (LOCAL, CONTROLLER, ...)
+OFPPC_PORT_DOWN = 1         # port administratively down
+OFPPS_LINK_DOWN = 1         # no physical link present
+STP_BLOCKING_STATES = (0, 1)  # stplib PORT_STATE_DISABLE, PORT_STATE_BLOCK
+
+# thresholds for flagging ports
+ERROR_RATE_THRESHOLD = 0.01  # errors per packet
+DROP_RATE_THRESHOLD = 0.01   # drops per packet
+UTILIZATION_Z_THRESHOLD = 3.5  # robust z-score (median / MAD) of bytes per second
+
+COUNTERS = ('rx_packets', 'tx_packets', 'rx_bytes', 'tx_bytes', 'rx_dropped', 'tx_dropped', 'rx_errors', 'tx_errors', 'duration_sec')
+RX_PACKETS, TX_PACKETS, RX_BYTES, TX_BYTES, RX_DROPPED, TX_DROPPED, RX_ERRORS, TX_ERRORS, DURATION = range(len(COUNTERS))
+
+# explicit health questions answered from the local report (everything else goes to the LLM)
+HEALTH_TERM = r'(?:anomal\w*|errors?|drops?|dropped packets|packet loss|congest\w*|dead ports|down ports|unreachable hosts|problems|issues)'
+HEALTH_QUESTIONS = [
+    re.compile(rf'^(?:(?:can|could) you |please )?(?:are there|is there|detect|check for|find|report|show|list) (?:any |all )?'
+               rf'{HEALTH_TERM}(?:(?:,|,? or|,? and) {HEALTH_TERM})*(?: (?:in|on) the network)?$'),
+    re.compile(r'^(?:what is the |how is the |check the |show the |report the )?(?:network health|health of the network)(?: check)?$'),
+    re.compile(r'^(?:is the network healthy|how healthy is the network)$'),
+]
+
+
+# combine (dpid, port) pairs into a single sortable int64 key
+def port_keys(dpids, ports):
+    return (np.asarray(dpids, dtype=np.int64) << 32) | np.asarray(ports, dtype=np.int64)
+
+
+# load port counters of a snapshot into a key vector and a (ports x counters) matrix
+def load_port_counters(network_state):
+    rows, dpids, ports = [], [], []
+    for dpid, stats in ((network_state or {}).get('port_stats') or {}).items():
+        for stat in stats or []:
+            port_no = int(stat.get('port_no', 0))
+            if port_no > OFPP_MAX:
+                continue
+            dpids.append(int(dpid))
+            ports.append(port_no)
+            rows.append([float(stat.get(c, 0) or 0) for c in COUNTERS])
+
+    keys = port_keys(dpids, ports)
+    counters = np.asarray(rows, dtype=np.float64).reshape(len(rows), len(COUNTERS))
+    order = np.argsort(keys)
+    return keys[order], counters[order]
+
+
+# load port description config / state bits into key-aligned vectors
+def load_port_descriptions(network_state):
+    dpids, ports, config, state = [], [], [], []
+    for dpid, descs in ((network_state or {}).get('port_description_stats') or {}).items():
+        for desc in descs or []:
+            port_no = int(desc.get('port_no', 0))
+            if port_no > OFPP_MAX:
+                continue
+            dpids.append(int(dpid))
+            ports.append(port_no)
+            config.append(int(desc.get('config', 0) or 0))
+            state.append(int(desc.get('state', 0) or 0))
+
+    return port_keys(dpids, ports), np.asarray(config, dtype=np.int64), np.asarray(state, dtype=np.int64)
+
+
+# get the previous network state snapshot from the logs folder (history for rate calculation)
+def previous_network_state(log_dir='logs'):
+    snapshots = sorted(
+        f for f in glob.glob(os.path.join(log_dir, '*.json'))
+        if re.match(r'\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}\.json$', os.path.basename(f))
+    )
+    # newest snapshot is the one just written by get_network_state()
+    if len(snapshots) < 2:
+        return None
+    try:
+        with open(snapshots[-2], 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f'Error reading previous network state snapshot: {e}')
+        return None
+
+
+# compute per-port counter rates; use history deltas if available, else cumulative averages
+def port_rates(keys, counters, previous_state=None):
+    deltas = counters.copy()
+    source = 'cumulative'
+
+    if previous_state is not None and len(keys):
+        prev_keys, prev_counters = load_port_counters(previous_state)
+        if len(prev_keys):
+            idx = np.clip(np.searchsorted(prev_keys, keys), 0, len(prev_keys) - 1)
+            found = prev_keys[idx] == keys
+            diff = counters - prev_counters[idx]
+            # only use deltas for ports seen before whose counters did not reset
+            usable = found & np.all(diff >= 0, axis=1) & (diff[:, DURATION] > 0)
+            deltas[usable] = diff[usable]
+            if usable.any():
+                source = 'history'
+
+    seconds = np.maximum(deltas[:, DURATION], 1.0)
+    packets = deltas[:, RX_PACKETS] + deltas[:, TX_PACKETS]
+    return {
+        'source': source,
+        'error_rate': (deltas[:, RX_ERRORS] + deltas[:, TX_ERRORS]) / np.maximum(packets, 1.0),
+        'drop_rate': (deltas[:, RX_DROPPED] + deltas[:, TX_DROPPED]) / np.maximum(packets, 1.0),
+        'bytes_per_sec': (deltas[:, RX_BYTES] + deltas[:, TX_BYTES]) / seconds,
+    }
+
+
+# robust z-score (median / MAD); falls back to the mean absolute deviation if MAD is zero
+def robust_zscore(values):
+    if len(values) < 3:
+        return np.zeros(len(values))
+    median = np.median(values)
+    mad = np.median(np.abs(values - median))
+    if mad > 0:
+        return 0.6745 * (values - median) / mad
+    # more than half the ports share one rate (e.g. idle); a std z-score could never exceed (n-1)/sqrt(n)
+    mean_ad = np.mean(np.abs(values - median))
+    if mean_ad > 0:
+        return (values - median) / (1.253314 * mean_ad)
+    return np.zeros(len(values))
+
+
+# get stp-blocked ports which still have flow entries forwarding packets to them
+def blocked_ports_with_flows(network_state):
+    blocked = []
+    for dpid, ports in ((network_state or {}).get('stp_port_states') or {}).items():
+        for port_no, stp_state in (ports or {}).items():
+            if int(stp_state) in STP_BLOCKING_STATES:
+                blocked.append((int(dpid), int(port_no)))
+    if not blocked:
+        return []
+
+    dpids, out_ports, packets = [], [], []
+    for dpid, flows in ((network_state or {}).get('flow_tables') or {}).items():
+        for flow in flows or []:
+            for action in flow.get('actions', []):
+                dpids.append(int(dpid))
+                out_ports.append(int(action.get('port', 0)))
+                packets.append(int(flow.get('packets', 0) or 0))
+
+    flow_keys = port_keys(dpids, out_ports)
+    packets = np.asarray(packets, dtype=np.int64)
+    blocked_keys = port_keys(*zip(*blocked))
+    hit = np.isin(flow_keys, blocked_keys) & (packets > 0)
+
+    results = []
+    for key in np.unique(flow_keys[hit]):
+        mask = hit & (flow_keys == key)
+        results.append({
+            'switch': int(key >> 32),
+            'port': int(key & 0xffffffff),
+            'flows': int(mask.sum()),
+            'packets': int(packets[mask].sum()),
+        })
+    return results
+
+
+# get topology hosts that the controller has not learned a location for
+def unlocated_hosts(network_state, network_topology):
+    hosts = (network_topology or {}).get('hosts', {})
+    known = set(((network_state or {}).get('host_table') or {}).keys())
+    return sorted(name for name, host in hosts.items() if host.get('mac') not in known)
+
+
+# function to pre-screen the network state for anomalies in one vectorised pass
+def diagnose(network_state, network_topology=None, previous_state=None):
+    if network_state is None:
+        return {'error': 'Controller state unavailable; network health cannot be checked.'}
+
+    keys, counters = load_port_counters(network_state)
+    rates = port_rates(keys, counters, previous_state)
+    utilization_z = robust_zscore(rates['bytes_per_sec'])
+
+    # link / admin down ports from the port descriptions (aligned to the stats keys)
+    desc_keys, config, state = load_port_descriptions(network_state)
+    down_keys = desc_keys[((config & OFPPC_PORT_DOWN) | (state & OFPPS_LINK_DOWN)) != 0]
+
+    flags = {
+        'errors': rates['error_rate'] > ERROR_RATE_THRESHOLD,
+        'drops': rates['drop_rate'] > DROP_RATE_THRESHOLD,
+        'link_down': np.isin(keys, down_keys),
+        'utilization_outlier': utilization_z > UTILIZATION_Z_THRESHOLD,
+    }
+    flagged = np.logical_or.reduce(list(flags.values())) if len(keys) else np.zeros(0, dtype=bool)
+
+    flagged_ports = []
+    for i in np.flatnonzero(flagged):
+        flagged_ports.append({
+            'switch': int(keys[i] >> 32),
+            'port': int(keys[i] & 0xffffffff),
+            'flags': [name for name, mask in flags.items() if mask[i]],
+            'error_rate': round(float(rates['error_rate'][i]), 4),
+            'drop_rate': round(float(rates['drop_rate'][i]), 4),
+            'bytes_per_sec': round(float(rates['bytes_per_sec'][i]), 1),
+        })
+
+    # ports only present in the descriptions (no counters) can still be down
+    for key in np.setdiff1d(down_keys, keys):
+        flagged_ports.append({'switch': int(key >> 32), 'port': int(key & 0xffffffff), 'flags': ['link_down']})
+
+    bytes_per_sec = rates['bytes_per_sec']
+    return {
+        'summary': {
+            'switches': len((network_state or {}).get('switches') or []),
+            'ports': int(len(keys)),
+            'rates_from': rates['source'],
+            'total_bytes_per_sec': round(float(bytes_per_sec.sum()), 1),
+            'median_bytes_per_sec': round(float(np.median(bytes_per_sec)), 1) if len(keys) else 0.0,
+            'max_error_rate': round(float(rates['error_rate'].max()), 4) if len(keys) else 0.0,
+            'max_drop_rate': round(float(rates['drop_rate'].max()), 4) if len(keys) else 0.0,
+            'flagged_ports': len(flagged_ports),
+        },
+        'flagged_ports': flagged_ports,
+        'blocked_ports_with_flows': blocked_ports_with_flows(network_state),
+        'unlocated_hosts': unlocated_hosts(network_state, network_topology),
+    }
+
+
+# check whether the intent is an explicit network health question
+def is_diagnostic_intent(user_intent):
+    text = re.sub(r'\s+', ' ', user_intent.lower()).strip(' ?.!')
+    return any(q.match(text) for q in HEALTH_QUESTIONS)
+
+
+# reduce the network state sent to the LLM to the flagged ports plus summary stats
+def compact_state(network_state, report):
+    if not network_state:
+        return network_state
+
+    flagged = {(p['switch'], p['port']) for p in report['flagged_ports']}
+    def only_flagged(per_switch):
+        return {
+            dpid: [p for p in entries or [] if (int(dpid), int(p.get('port_no', 0))) in flagged]
+            for dpid, entries in (per_switch or {}).items()
+        }
+
+    state = dict(network_state)
+    state['port_stats'] = only_flagged(network_state.get('port_stats'))
+    state['port_description_stats'] = only_flagged(network_state.get('port_description_stats'))
+    state['diagnostics'] = report
+    return state
+
+
+# format diagnostics report as a readable answer
+def format_report(report):
+    if 'error' in report:
+        return f"[Diagnostics] {report['error']}"
+
+    summary = report['summary']
+    lines = [
+        f"[Diagnostics] {summary['switches']} switches, {summary['ports']} ports checked "
+        f"(rates from {summary['rates_from']} counters, total {summary['total_bytes_per_sec']} B/s)."
+    ]
+
+    for p in report['flagged_ports']:
+        details = ''
+        if 'error_rate' in p:
+            details = f" (error rate {p['error_rate']}, drop rate {p['drop_rate']}, {p['bytes_per_sec']} B/s)"
+        lines.append(f"- Port {p['switch']}-eth{p['port']}: {', '.join(p['flags'])}{details}")
+
+    for p in report['blocked_ports_with_flows']:
+        lines.append(f"- Port {p['switch']}-eth{p['port']} is STP-blocked but {p['flows']} flow(s) forwarded {p['packets']} packets to it")
+
+    if report['unlocated_hosts']:
+        lines.append(f"- No learned location for hosts: {', '.join(report['unlocated_hosts'])}")
+
+    if len(lines) == 1:
+        lines.append('No congestion, port errors, dead ports, or unreachable hosts detected.')
+    return '\n'.join(lines)
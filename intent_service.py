@@ -0,0 +1,307 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
+from datetime import datetime
+from urllib.parse import urlparse
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import northbound_agent as agent
+
+
+LATENCY_SAMPLES = 1000     # latency samples kept per stage
+MAX_FINISHED_INTENTS = 1000  # finished intent records kept before the oldest are evicted
+FINISHED_STATUSES = ('answered', 'rejected', 'applied', 'failed')
+
+HTTP_REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 409: 'Conflict'}
+
+
+# get the switch ids touched by an action list (used for per-switch locking)
+def action_switches(actions):
+    switches = set()
+    for action in actions or []:
+        try:
+            switches.add(int(action['switch']))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return sorted(switches)
+
+
+# summarize latency samples (seconds) as count / mean / p50 / p95 / max
+def latency_summary(samples):
+    if not samples:
+        return {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'max': None}
+
+    ordered = sorted(samples)
+    def pick(pct):
+        return round(ordered[min(len(ordered) - 1, int(pct * len(ordered)))], 3)
+
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered), 3),
+        'p50': pick(0.50),
+        'p95': pick(0.95),
+        'max': round(ordered[-1], 3),
+    }
+
+
+# multi-operator intent service; asyncio core with a bounded llm pool and per-switch locks
+class IntentService:
+    def __init__(self, llm_workers=4, resolve=agent.resolve_intent, apply=agent.apply_action, verify=agent.verify_proposal,
+                 apply_timeout=2 * agent.CONTROLLER_TIMEOUT):
+        self.llm_workers = llm_workers
+        self.apply_timeout = apply_timeout  # seconds before an apply is reported timed_out (locks stay held until it ends)
+        self.resolve = resolve  # (intent, snapshot) -> (action, is_json), fills snapshot; stub to test without claude
+        self.apply = apply      # action list -> controller results; stub to test without ryu
+        self.verify = verify    # (action list, snapshot) -> reachability changes (pre-apply check)
+
+        self.intents = {}       # intent records by id
+        self.finished = deque()  # ids of finished intents, oldest first (evicted past MAX_FINISHED_INTENTS)
+        self.switch_locks = {}  # asyncio.Lock per switch id
+        self.llm_in_flight = 0
+        self.latencies = {name: deque(maxlen=LATENCY_SAMPLES) for name in ('queue_wait', 'resolve', 'lock_wait', 'apply')}
+
+        self.llm_pool = ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix='llm')
+        self.queue = None
+        self.tasks = set()
+
+    # function to create the intent queue and start the llm workers (needs a running event loop, no socket)
+    def start(self):
+        self.queue = asyncio.Queue()
+        for _ in range(self.llm_workers):
+            task = asyncio.ensure_future(self.llm_worker())
+            self.tasks.add(task)
+
+    # function to set a final status and evict the oldest finished intents
+    def finish(self, record, status):
+        record['status'] = status
+        self.finished.append(record['id'])
+        while len(self.finished) > MAX_FINISHED_INTENTS:
+            self.intents.pop(self.finished.popleft(), None)
+
+    # function to register a new intent and queue it for the llm pool
+    def submit(self, user_intent, operator=None):
+        intent_id = uuid.uuid4().hex[:12]
+        record = {
+            'id': intent_id,
+            'intent': user_intent,
+            'operator': operator,
+            'status': 'queued',
+            'submitted_at': datetime.now().isoformat(timespec='seconds'),
+            'actions': None,
+            'verification': None,
+            'answer': None,
+            'results': None,
+            'error': None,
+            'latency': {},
+            '_t_submit': time.monotonic(),
+        }
+        self.intents[intent_id] = record
+        self.queue.put_nowait(intent_id)
+        return record
+
+    # worker loop; one per llm slot so queue depth reflects intents waiting on the llm
+    async def llm_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            intent_id = await self.queue.get()
+            record = self.intents[intent_id]
+            started = time.monotonic()
+            record['status'] = 'processing'
+            record['latency']['queue_wait'] = round(started - record['_t_submit'], 3)
+            self.latencies['queue_wait'].append(started - record['_t_submit'])
+
+            self.llm_in_flight += 1
+            snapshot = {}  # network snapshot the intent was resolved against (reused by the verifier)
+            try:
+                action, is_json = await loop.run_in_executor(self.llm_pool, self.resolve, record['intent'], snapshot)
+                if action and is_json:
+                    record['actions'] = action
+                    record['verification'] = await self.verify_intent(action, snapshot)
+                    record['status'] = 'awaiting_approval'
+                else:
+                    record['answer'] = action
+                    self.finish(record, 'answered')
+            except Exception as e:
+                record['error'] = f'Error resolving intent: {e}'
+                self.finish(record, 'failed')
+            finally:
+                self.llm_in_flight -= 1
+                elapsed = time.monotonic() - started
+                record['latency']['resolve'] = round(elapsed, 3)
+                self.latencies['resolve'].append(elapsed)
+                self.queue.task_done()
+
+    # run the reachability verifier on proposed actions (failure does not block approval)
+    async def verify_intent(self, actions, snapshot):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, self.verify, actions, snapshot)
+        except Exception as e:
+            return {'error': f'Error verifying proposed actions: {e}'}
+
+    # function to approve or reject a proposed action list
+    def decide(self, intent_id, approve):
+        record = self.intents.get(intent_id)
+        if record is None:
+            return 404, {'error': f'Intent {intent_id} not found'}
+        if record['status'] != 'awaiting_approval':
+            return 409, {'error': f"Intent {intent_id} is {record['status']}, not awaiting_approval"}
+
+        if not approve:
+            self.finish(record, 'rejected')
+            return 200, self.public(record)
+
+        record['status'] = 'approved'
+        task = asyncio.ensure_future(self.apply_intent(record))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return 202, self.public(record)
+
+    # apply actions while holding the locks of every switch they touch
+    async def apply_intent(self, record):
+        loop = asyncio.get_running_loop()
+        switches = action_switches(record['actions'])
+        started = time.monotonic()
+
+        # always acquire in sorted switch order so overlapping intents cannot deadlock
+        async with AsyncExitStack() as stack:
+            for dpid in switches:
+                await stack.enter_async_context(self.switch_locks.setdefault(dpid, asyncio.Lock()))
+            locked = time.monotonic()
+            record['latency']['lock_wait'] = round(locked - started, 3)
+            self.latencies['lock_wait'].append(locked - started)
+
+            record['status'] = 'applying'
+            future = loop.run_in_executor(None, self.apply, record['actions'])
+            try:
+                try:
+                    record['results'] = await asyncio.wait_for(asyncio.shield(future), self.apply_timeout)
+                except asyncio.TimeoutError:
+                    # the executor thread cannot be cancelled; keep the locks until it ends
+                    record['status'] = 'timed_out'
+                    record['error'] = f'Controller did not answer within {self.apply_timeout}s; outcome unknown until the request ends'
+                    record['results'] = await future
+                    record['error'] = None
+                status = 'applied'
+            except Exception as e:
+                record['error'] = f'Error applying actions: {e}'
+                status = 'failed'
+
+            elapsed = time.monotonic() - locked
+            record['latency']['apply'] = round(elapsed, 3)
+            record['latency']['total'] = round(time.monotonic() - record['_t_submit'], 3)
+            self.latencies['apply'].append(elapsed)
+            self.finish(record, status)
+
+    # function to get queue depth, intent counts, and latency stats
+    def metrics(self):
+        by_status = {}
+        for record in self.intents.values():
+            by_status[record['status']] = by_status.get(record['status'], 0) + 1
+
+        return {
+            'queue_depth': self.queue.qsize(),
+            'llm_workers': self.llm_workers,
+            'llm_in_flight': self.llm_in_flight,
+            'locked_switches': sorted(dpid for dpid, lock in self.switch_locks.items() if lock.locked()),
+            'intents': by_status,
+            'latency': {name: latency_summary(samples) for name, samples in self.latencies.items()},
+            'intent_compiler': agent.compiler_summary(),
+        }
+
+    # strip internal fields from intent record
+    def public(self, record):
+        return {k: v for k, v in record.items() if not k.startswith('_')}
+
+    # route a parsed http request to the service
+    async def dispatch(self, method, path, body):
+        parts = [p for p in path.split('/') if p]
+
+        if parts == ['metrics'] and method == 'GET':
+            return 200, self.metrics()
+
+        if parts == ['intents']:
+            if method == 'GET':
+                return 200, [self.public(r) for r in self.intents.values()]
+            if method == 'POST':
+                payload = json.loads(body or b'{}')
+                user_intent = (payload.get('intent') or '').strip()
+                if not user_intent:
+                    return 400, {'error': "Missing 'intent' field"}
+                return 202, self.public(self.submit(user_intent, payload.get('operator')))
+            return 405, {'error': f'{method} not allowed on /intents'}
+
+        if len(parts) == 2 and parts[0] == 'intents' and method == 'GET':
+            record = self.intents.get(parts[1])
+            if record is None:
+                return 404, {'error': f'Intent {parts[1]} not found'}
+            return 200, self.public(record)
+
+        if len(parts) == 3 and parts[0] == 'intents' and parts[2] in ('approve', 'reject') and method == 'POST':
+            return self.decide(parts[1], approve=parts[2] == 'approve')
+
+        return 404, {'error': f'No route for {method} {path}'}
+
+    # minimal http/1.1 handler (one request per connection)
+    async def handle_connection(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get('content-length', 0))
+            body = await reader.readexactly(length) if length else b''
+            status, payload = await self.dispatch(method.upper(), urlparse(target).path, body)
+        except Exception as e:
+            status, payload = 400, {'error': f'Malformed request: {e}'}
+
+        res_body = json.dumps(payload, default=str).encode('utf-8')
+        writer.write(
+            f'HTTP/1.1 {status} {HTTP_REASONS.get(status, "")}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(res_body)}\r\n'
+            f'Connection: close\r\n\r\n'.encode('latin-1') + res_body
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    # function to start the llm workers and http api
+    async def serve(self, host='127.0.0.1', port=8080):
+        self.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f'Intent service listening on http://{host}:{port} ({self.llm_workers} LLM workers)')
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run PatchHunter as a multi-operator intent service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--llm-workers', type=int, default=4, help='max concurrent LLM queries')
+    parser.add_argument('--apply-timeout', type=float, default=2 * agent.CONTROLLER_TIMEOUT,
+                        help='seconds before a slow controller request is reported timed_out')
+    args = parser.parse_args()
+
+    service = IntentService(llm_workers=args.llm_workers, apply_timeout=args.apply_timeout)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print('Stopping the intent service...\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,12 @@ from ryu.app.wsgi import ControllerBase, route
 from ryu.app.wsgi import WSGIApplication
 from webob import Response
 import json
+import os
+import time
+
+LEARNED_FLOW_COOKIE = 0x1   # cookie of flows installed by mac learning (packet_in)
+COOKIE_MASK = 0xffffffffffffffff
+PACKET_IN_WINDOW = 60       # seconds of packet_in counted after the first topology change event (2x forward delay + margin)
 
 # SDN controller; extends RYU SimpleSwitch13 with added stp
 class SimpleSwitch13(simple_switch_13.SimpleSwitch13):
@@ -22,6 +28,9 @@ class SimpleSwitch13(simple_switch_13.SimpleSwitch13):
         'stplib': stplib.Stp
     }
 
+    # set True (or FULL_FLUSH_ON_TOPOLOGY_CHANGE=1) to flush the whole mac table on topology change (old behaviour, for comparison)
+    FULL_FLUSH_ON_TOPOLOGY_CHANGE = os.getenv('FULL_FLUSH_ON_TOPOLOGY_CHANGE') == '1'
+
     def __init__(self, *args, **kwargs):
         super(SimpleSwitch13, self).__init__(*args, **kwargs)
         self.mac_to_port = {}   # mac-to-port mapping (packet_in)
@@ -31,6 +40,21 @@ class SimpleSwitch13(simple_switch_13.SimpleSwitch13):
         self.port_desc_stats = {} # operational states / features of ports
         self.flow_stats = {}    # flow entries
         self.stp_port_state = {}  # stp port states
+        self.converged_forwarding = {}  # ports in stp FORWARD at the last convergence of each switch
+
+        # packet_in counters to measure controller load during stp reconvergence
+        self.packet_in_stats = {
+            'flush_mode': 'full' if self.FULL_FLUSH_ON_TOPOLOGY_CHANGE else 'scoped',
+            'total': 0,
+            'topology_changes': 0,
+            'window_seconds': PACKET_IN_WINDOW,
+            'window_start': None,     # first topology change event of the current window
+            'window_packet_in': 0,
+            'window_packet_in_per_dpid': {},
+            'previous_windows': [],
+            'flushed_macs': 0,
+            'kept_macs': 0,
+        }
 
         # inject stp and wsgi contexts
         self.stp = kwargs['stplib']
@@ -85,11 +109,20 @@ class SimpleSwitch13(simple_switch_13.SimpleSwitch13):
             return None
 
 
-    # function to delete flow entries
-    def delete_flow(self, datapath):
+    # function to delete flow entries; with src / dst mac only the flow with that exact match and priority
+    def delete_flow(self, datapath, src_mac=None, dst_mac=None, priority=None):
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
 
+        if src_mac and dst_mac:
+            match = parser.OFPMatch(eth_src=src_mac, eth_dst=dst_mac)
+            mod = parser.OFPFlowMod(
+                datapath, command=ofproto.OFPFC_DELETE_STRICT,
+                out_port=ofproto.OFPP_ANY, out_group=ofproto.OFPG_ANY,
+                priority=1 if priority is None else priority, match=match)
+            datapath.send_msg(mod)
+            return
+
         # loop through known dsts; delete matching flows
         for dst in self.mac_to_port[datapath.id].keys():
             match = parser.OFPMatch(eth_dst=dst)
@@ -100,6 +133,92 @@ class SimpleSwitch13(simple_switch_13.SimpleSwitch13):
             datapath.send_msg(mod)
 
 
+    # add flow; same as SimpleSwitch13.add_flow with an optional cookie
+    def add_flow(self, datapath, priority, match, actions, buffer_id=None, cookie=0):
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+
+        inst = [parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
+        if buffer_id:
+            mod = parser.OFPFlowMod(datapath=datapath, buffer_id=buffer_id, cookie=cookie,
+                                    priority=priority, match=match, instructions=inst)
+        else:
+            mod = parser.OFPFlowMod(datapath=datapath, priority=priority, cookie=cookie,
+                                    match=match, instructions=inst)
+        datapath.send_msg(mod)
+
+
+    # function to delete learned flows (by cookie) towards given macs and from / to given ports
+    def delete_learned_flows(self, datapath, macs=(), ports=()):
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+
+        mods = [(parser.OFPMatch(eth_dst=mac), ofproto.OFPP_ANY) for mac in macs]
+        for port in ports:
+            mods.append((parser.OFPMatch(in_port=port), ofproto.OFPP_ANY))
+            mods.append((parser.OFPMatch(), port))
+
+        # cookie mask restricts the delete to flows installed by mac learning
+        for match, out_port in mods:
+            mod = parser.OFPFlowMod(
+                datapath, command=ofproto.OFPFC_DELETE,
+                cookie=LEARNED_FLOW_COOKIE, cookie_mask=COOKIE_MASK,
+                out_port=out_port, out_group=ofproto.OFPG_ANY,
+                match=match)
+            datapath.send_msg(mod)
+
+
+    # function to invalidate the macs and learned flows behind ports that entered or left stp FORWARD
+    def flush_changed_ports(self, datapath, ports):
+        table = self.mac_to_port.get(datapath.id, {})
+        stale = {mac for mac, port in table.items() if port in ports}
+        self.delete_learned_flows(datapath, macs=stale, ports=ports)
+        for mac in stale:
+            del table[mac]
+
+        # hosts behind the changed ports may now be reached through other ports of other switches
+        for dpid, other in self.mac_to_port.items():
+            moved = stale & other.keys() if dpid != datapath.id else set()
+            if moved and dpid in self.datapaths:
+                self.delete_learned_flows(self.datapaths[dpid], macs=moved)
+                for mac in moved:
+                    del other[mac]
+                self.packet_in_stats['flushed_macs'] += len(moved)
+
+        self.packet_in_stats['flushed_macs'] += len(stale)
+        self.packet_in_stats['kept_macs'] += len(table)
+        return stale
+
+
+    # function to open a packet_in window at the first topology change event (later events fall into it)
+    def open_packet_in_window(self):
+        stats = self.packet_in_stats
+        stats['topology_changes'] += 1
+        now = time.time()
+        if stats['window_start'] is not None and now - stats['window_start'] <= PACKET_IN_WINDOW:
+            return
+
+        if stats['window_start'] is not None:
+            stats['previous_windows'] = (stats['previous_windows'] + [{
+                'start': stats['window_start'],
+                'packet_in': stats['window_packet_in'],
+                'per_dpid': stats['window_packet_in_per_dpid'],
+            }])[-10:]
+        stats['window_start'] = now
+        stats['window_packet_in'] = 0
+        stats['window_packet_in_per_dpid'] = {}
+
+
+    # function to count a packet_in (in total, and per switch if inside the window)
+    def count_packet_in(self, dpid):
+        stats = self.packet_in_stats
+        stats['total'] += 1
+        if stats['window_start'] is not None and time.time() - stats['window_start'] <= PACKET_IN_WINDOW:
+            stats['window_packet_in'] += 1
+            per_dpid = stats['window_packet_in_per_dpid']
+            per_dpid[dpid] = per_dpid.get(dpid, 0) + 1
+
+
     # function to change port state
     def set_port_state(self, dpid, port, disable=True):
         try:
@@ -233,9 +352,15 @@ class SimpleSwitch13(simple_switch_13.SimpleSwitch13):
 
         dpid = datapath.id
         self.mac_to_port.setdefault(dpid, {})
+        self.count_packet_in(dpid)
 
         self.logger.info("packet in %s %s %s %s", dpid, src, dst, in_port)
 
+        # host moved to another port; drop learned flows still pointing to the old one
+        old_port = self.mac_to_port[dpid].get(src)
+        if old_port is not None and old_port != in_port:
+            self.delete_learned_flows(datapath, macs=[src])
+
         # learn a mac address to avoid FLOOD next time.
         self.mac_to_port[dpid][src] = in_port
         self.host_table[src] = {"dpid": dpid, "port": in_port}
@@ -251,7 +376,7 @@ class SimpleSwitch13(simple_switch_13.SimpleSwitch13):
         # install a flow to avoid packet_in next time
         if out_port != ofproto.OFPP_FLOOD:
             match = parser.OFPMatch(in_port=in_port, eth_dst=dst)
-            self.add_flow(datapath, 1, match, actions)
+            self.add_flow(datapath, 1, match, actions, cookie=LEARNED_FLOW_COOKIE)
 
         # send packet out
         data = None
@@ -267,12 +392,18 @@ class SimpleSwitch13(simple_switch_13.SimpleSwitch13):
     def _topology_change_handler(self, ev):
         dp = ev.dp
         dpid_str = dpid_lib.dpid_to_str(dp.id)
+
+        self.open_packet_in_window()
+
+        # stplib moves every port to BLOCK before this event, so the scoped flush waits for reconvergence
+        if not self.FULL_FLUSH_ON_TOPOLOGY_CHANGE or dp.id not in self.mac_to_port:
+            return
+
         msg = 'Receive topology change event. Flush MAC table.'
         self.logger.debug("[dpid=%s] %s", dpid_str, msg)
-
-        if dp.id in self.mac_to_port:
-            self.delete_flow(dp)
-            del self.mac_to_port[dp.id]
+        self.packet_in_stats['flushed_macs'] += len(self.mac_to_port[dp.id])
+        self.delete_flow(dp)
+        del self.mac_to_port[dp.id]
 
 
     # event handler to track datapaths
@@ -292,8 +423,22 @@ class SimpleSwitch13(simple_switch_13.SimpleSwitch13):
     # event handler to handle port state change
     @set_ev_cls(stplib.EventPortStateChange, MAIN_DISPATCHER)
     def _port_state_change_handler(self, ev):
-        self.stp_port_state.setdefault(ev.dp.id, {})[ev.port_no] = ev.port_state
+        states = self.stp_port_state.setdefault(ev.dp.id, {})
+        states[ev.port_no] = ev.port_state
         dpid_str = dpid_lib.dpid_to_str(ev.dp.id)
+
+        # switch reconverged once a port reaches FORWARD and none is left in LISTEN / LEARN;
+        # only ports that entered or left FORWARD since the last convergence are flushed
+        transitional = (stplib.PORT_STATE_LISTEN, stplib.PORT_STATE_LEARN)
+        if ev.port_state == stplib.PORT_STATE_FORWARD and not any(st in transitional for st in states.values()):
+            forwarding = {port for port, st in states.items() if st == stplib.PORT_STATE_FORWARD}
+            changed = forwarding ^ self.converged_forwarding.get(ev.dp.id, set())
+            self.converged_forwarding[ev.dp.id] = forwarding
+            if changed and not self.FULL_FLUSH_ON_TOPOLOGY_CHANGE:
+                stale = self.flush_changed_ports(ev.dp, changed)
+                self.logger.debug("[dpid=%s] Reconverged; flush %d MAC entries behind ports %s.",
+                                  dpid_str, len(stale), sorted(changed))
+
         of_state = {stplib.PORT_STATE_DISABLE: 'DISABLE',
                     stplib.PORT_STATE_BLOCK: 'BLOCK',
                     stplib.PORT_STATE_LISTEN: 'LISTEN',
@@ -320,16 +465,23 @@ class IntentAPI(ControllerBase):
         return Response(content_type='application/json', body=res_body)
 
 
+    # route to fetch packet_in counters (controller load during stp reconvergence)
+    @route('intent', '/intent/packet-in-stats', methods=['GET'])
+    def get_packet_in_stats(self, req, **kwargs):
+        res_body = json.dumps(self.controller.packet_in_stats).encode('utf-8')
+        return Response(content_type='application/json', body=res_body)
+
+
     # route to implement new actions in controller
     @route('intent', '/intent/implement', methods=['POST'])
     def post_action(self, req, **kwargs):
         actions = req.json or []
-        of_actions = []
         results = []
 
         # loop through all proposed actions
         for action in actions: 
             action_type = action.get("action")  # get action type
+            of_actions = []
 
             if action_type == "install_flow":
                 switch = int(action["switch"])
@@ -359,13 +511,18 @@ class IntentAPI(ControllerBase):
                     if out_port is not None:
                         of_actions = [parser.OFPActionOutput(int(out_port))]
 
-                self.controller.add_flow(datapath, 1, match, of_actions)    # add flow
+                # optional priority (e.g. drop rules must win over learned flows)
+                priority = int(action.get("priority", 1))
+
+                self.controller.add_flow(datapath, priority, match, of_actions)    # add flow
                 result = "Flow added successfully"
 
             elif action_type == "delete_flow":
                 switch = int(action['switch'])
                 datapath = self.controller.datapaths.get(switch)
-                self.controller.delete_flow(datapath)   # delete flow
+                priority = action.get("priority")
+                self.controller.delete_flow(datapath, action.get("src_mac"), action.get("dst_mac"),
+                                            None if priority is None else int(priority))   # delete flow
                 result = "Flow deleted successfully"
 
             elif action_type == "block_port":
@@ -0,0 +1,74 @@
+#!/usr/bin/python
+
+# measure controller packet_in load during stp reconvergence (run once per flush mode and compare)
+# 1. start the controller: ryu-manager mininet/controller.py
+#    (full flush for comparison: FULL_FLUSH_ON_TOPOLOGY_CHANGE=1 ryu-manager mininet/controller.py)
+# 2. run: sudo python mininet/measure_reconvergence.py
+
+from mininet.net import Mininet
+from mininet.node import RemoteController
+from mininet.log import setLogLevel
+import argparse
+import json
+import time
+
+import requests
+
+from topology import IntentSDNTopo
+
+
+# get packet_in counters from the controller
+def packet_in_stats(controller_url):
+    return requests.get(f'{controller_url}/intent/packet-in-stats', timeout=10).json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure packet_in during STP reconvergence')
+    parser.add_argument('--controller-url', default='http://127.0.0.1:8080')
+    parser.add_argument('--converge', type=float, default=40, help='seconds for stp to converge (2x forward delay + margin)')
+    parser.add_argument('--link', nargs=2, default=['s2', 's4'], help='link to take down and bring back up')
+    parser.add_argument('--down', type=float, default=5, help='seconds the link stays down')
+    args = parser.parse_args()
+
+    net = Mininet(topo=IntentSDNTopo(), controller=RemoteController('c1', ip='127.0.0.1', port=6653))
+    net.start()
+    try:
+        # converge, then learn every mac before the topology change
+        time.sleep(args.converge)
+        net.pingAll()
+
+        # steady traffic between all host pairs during the change
+        for src in net.hosts:
+            for dst in net.hosts:
+                if src != dst:
+                    src.cmd(f'ping -i 0.2 {dst.IP()} > /dev/null 2>&1 &')
+
+        net.configLinkStatus(args.link[0], args.link[1], 'down')
+        time.sleep(args.down)
+        net.configLinkStatus(args.link[0], args.link[1], 'up')
+
+        # wait until the packet_in window opened by the first topology change has closed
+        stats = packet_in_stats(args.controller_url)
+        if stats['window_start'] is None:
+            raise RuntimeError('Controller saw no topology change event')
+        time.sleep(max(0.0, stats['window_start'] + stats['window_seconds'] - time.time()) + 1)
+        stats = packet_in_stats(args.controller_url)
+
+        net.hosts[0].cmd("pkill -f 'ping -i 0.2'")
+    finally:
+        net.stop()
+
+    print(json.dumps({
+        'flush_mode': stats['flush_mode'],
+        'window_seconds': stats['window_seconds'],
+        'window_packet_in': stats['window_packet_in'],
+        'window_packet_in_per_dpid': stats['window_packet_in_per_dpid'],
+        'topology_changes': stats['topology_changes'],
+        'flushed_macs': stats['flushed_macs'],
+        'kept_macs': stats['kept_macs'],
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    setLogLevel('info')
+    main()
@@ -3,16 +3,88 @@ import os
 import anthropic
 import requests
 from datetime import datetime
+from collections import deque
 import json
+import re
+import threading
+import time
+import diagnostics
+import verifier
 
 
 load_dotenv()
 API_KEY = os.getenv("API_KEY")
 CONTROLLER_URL = os.getenv("CONTROLLER_API_URL")
+CONTROLLER_TIMEOUT = 10  # seconds; controller requests must not hang forever
 
 # init anthropic client (LLM)
 client = anthropic.Anthropic(api_key=API_KEY)
 
+# intent compiler grammar; each phrasing must match the whole intent, anything else goes to the llm
+HOST = r'h\d+|(?:[0-9a-f]{2}:){5}[0-9a-f]{2}|\d{1,3}(?:\.\d{1,3}){3}'
+SRC = rf'(?:host )?(?P<src>{HOST})'
+DST = rf'(?:host )?(?P<dst>{HOST})'
+ONE_HOST = rf'(?:host )?(?P<host>{HOST})'
+SWITCH = r'(?:the )?(?:switch s?|dpid |s)(?P<switch>\d+)'
+PORT_NUMBERS = r'(?P<ports>\d+(?:(?:, | and |, and )\d+)*)'
+PORT_REFS = [
+    rf'(?:the )?ports? {PORT_NUMBERS} (?:on|of) {SWITCH}',
+    rf'{SWITCH} ports? {PORT_NUMBERS}',
+    r's?(?P<switch>\d+)-eth(?P<ports>\d+)',
+    rf'(?P<all_ports>all) (?:the )?ports (?:on|of) {SWITCH}',
+]
+PAIRS = [rf'(?:between )?(?:hosts )?{SRC} and {DST}']  # both directions
+FLOWS = [rf'from {SRC} to {DST}']                      # one direction
+POLITE = re.compile(r'^(?:please |(?:can|could|would) you (?:please )?)?(?P<intent>.*?)(?: please)?$')
+
+PAIR_DENY = r'(?:block|deny|drop|stop|prevent)'
+PAIR_ALLOW = r'(?:unblock|allow|permit|restore|re-?enable)'
+TRAFFIC = r'(?:all )?(?:traffic|communication|packets|connectivity)'
+PORT_DENY = r'(?:disable|block|shut ?down|bring down|turn off)'
+PORT_ALLOW = r'(?:enable|re-?enable|unblock|bring up|turn on|restore)'
+ROUTE_QUESTIONS = [
+    r'(?:which|what) (?:route|path) do (?:the )?packets take',
+    r"(?:show|trace|find|get)(?: me)? the (?:route|path)",
+    r"(?:what is|what's) the (?:route|path)",
+    r'(?:route|path|trace)',
+]
+
+INTENT_GRAMMAR = (
+    [('block_pair', rf'{PAIR_DENY}(?: {TRAFFIC})? {pair}') for pair in PAIRS]
+    + [('block_pair', rf'(?:isolate|separate) (?:hosts )?{SRC} (?:from|and) {DST}')]
+    + [('block_flow', rf'{PAIR_DENY} {TRAFFIC} {flow}') for flow in FLOWS]
+    + [('allow_pair', rf'{PAIR_ALLOW}(?: {TRAFFIC})? {pair}(?: again)?') for pair in PAIRS]
+    + [('allow_flow', rf'{PAIR_ALLOW} {TRAFFIC} {flow}(?: again)?') for flow in FLOWS]
+    + [('route', rf'{question} {endpoints}') for question in ROUTE_QUESTIONS for endpoints in FLOWS + PAIRS]
+    + [('locate', rf'where is {ONE_HOST}(?: (?:attached|connected|located))?'),
+       ('locate', rf'locate {ONE_HOST}'),
+       ('locate', rf"(?:what is|what's) the location of {ONE_HOST}"),
+       ('locate', rf'which switch is {ONE_HOST} (?:attached|connected) to')]
+    + [('list_hosts', rf'(?:which|what) hosts are (?:connected|attached) to {SWITCH}'),
+       ('list_hosts', rf'(?:list|show)(?: all)?(?: the)? hosts (?:connected to|attached to|on) {SWITCH}')]
+    + [('block_port', rf'{PORT_DENY} {ref}') for ref in PORT_REFS]
+    + [('unblock_port', rf'{PORT_ALLOW} {ref}') for ref in PORT_REFS]
+    + [('check_port_status', rf'check(?: the)?(?: (?:status|state) of)? {ref}') for ref in PORT_REFS]
+    + [('check_port_status', rf"(?:what is|what's|show|get) the (?:status|state) of {ref}") for ref in PORT_REFS]
+    + [('check_port_status', rf'is {ref} (?:up|down|up or down|enabled|disabled|blocked)') for ref in PORT_REFS]
+)
+INTENT_GRAMMAR = [(kind, re.compile(pattern)) for kind, pattern in INTENT_GRAMMAR]
+
+BLOCK_FLOW_PRIORITY = 2  # drop rules must win over learned (priority 1) flows
+
+# required fields / types of the action schemas in build_confirmation_query
+ACTION_SCHEMAS = {
+    'install_flow': {'switch': int, 'src_mac': str, 'dst_mac': str, 'actions': list},
+    'delete_flow': {'switch': int},
+    'block_port': {'switch': int, 'port': int},
+    'unblock_port': {'switch': int, 'port': int},
+    'check_port_status': {'switch': int, 'port': int},
+}
+
+# hit rate / latency counters of the intent compiler
+compiler_stats = {'hits': 0, 'misses': 0, 'compile_time': 0.0, 'llm_times': deque(maxlen=50)}
+compiler_stats_lock = threading.Lock()
+
 
 # get network topology for LLM context
 def get_network_topology():
@@ -30,7 +102,7 @@ def get_network_topology():
 def get_network_state():
     try: 
         # get network state from controller
-        res = requests.get(f'{CONTROLLER_URL}/intent/get-state')
+        res = requests.get(f'{CONTROLLER_URL}/intent/get-state', timeout=CONTROLLER_TIMEOUT)
         network_state = res.json()
 
         # log in json file
@@ -181,6 +253,7 @@ def build_confirmation_query(intent, json_object):
             }}
         ]
         ```
+        Optionally add "src_mac", "dst_mac", and "priority" to delete only the flow with exactly that match and priority (e.g. a drop rule).
 
         - **block_port / unblock_port**
         ```json
@@ -250,10 +323,167 @@ def build_confirmation_query(intent, json_object):
         return None
 
 
+# resolve host name / mac / ip to (name, mac) using topology.json
+def resolve_host(token, network_topology):
+    for name, host in (network_topology or {}).get('hosts', {}).items():
+        if token in (name, host.get('mac'), host.get('ip')):
+            return name, host.get('mac')
+    return None
+
+
+# get the ports of a switch from the port descriptions (excluding reserved ports)
+def switch_ports(dpid, network_topology, network_state):
+    descs = ((network_state or {}).get('port_description_stats') or {})
+    descs = descs.get(str(dpid), descs.get(dpid, []))
+    ports = sorted(int(p['port_no']) for p in descs or [] if int(p.get('port_no', 0)) <= diagnostics.OFPP_MAX)
+    if ports:
+        return ports
+    # fallback to the port map of the static topology
+    port_map = (network_topology or {}).get('ports', {}).get(f's{dpid}', {})
+    return sorted(int(p) for p in port_map)
+
+
+# shortest path between two nodes in the static topology
+def topology_route(src, dst, network_topology):
+    graph = {}
+    for switch, neighbours in (network_topology or {}).get('switches', {}).items():
+        for neighbour in neighbours:
+            graph.setdefault(switch, set()).add(neighbour)
+            graph.setdefault(neighbour, set()).add(switch)
+
+    previous = {src: None}
+    queue = deque([src])
+    while queue:
+        node = queue.popleft()
+        if node == dst:
+            path = []
+            while node is not None:
+                path.append(node)
+                node = previous[node]
+            return path[::-1]
+        for neighbour in sorted(graph.get(node, ())):
+            if neighbour not in previous:
+                previous[neighbour] = node
+                queue.append(neighbour)
+    return None
+
+
+# check that each compiled action matches its schema and targets a known switch / port
+def validate_actions(actions, network_topology, network_state):
+    switches = {int(s) for s in (network_state or {}).get('switches') or []}
+    for action in actions:
+        schema = ACTION_SCHEMAS.get(action.get('action'))
+        if schema is None:
+            return False
+        for field, field_type in schema.items():
+            if not isinstance(action.get(field), field_type):
+                return False
+        if switches and action['switch'] not in switches:
+            return False
+        if 'port' in schema and action['port'] not in switch_ports(action['switch'], network_topology, network_state):
+            return False
+    return True
+
+
+# match the whole intent against the grammar; returns (kind, groups) or None
+def parse_intent(user_intent):
+    text = re.sub(r'\s+', ' ', user_intent.lower()).strip(' ?.!')
+    text = POLITE.fullmatch(text).group('intent')
+    for kind, pattern in INTENT_GRAMMAR:
+        match = pattern.fullmatch(text)
+        if match:
+            return kind, match.groupdict()
+    return None
+
+
+# compile common intents directly to actions; returns None if the intent is not understood
+def compile_intent(user_intent, network_topology, network_state):
+    parsed = parse_intent(user_intent)
+    if parsed is None:
+        return None
+    kind, groups = parsed
+
+    # host pair intents: route, allow, block
+    if kind in ('route', 'block_pair', 'block_flow', 'allow_pair', 'allow_flow'):
+        src, dst = resolve_host(groups['src'], network_topology), resolve_host(groups['dst'], network_topology)
+        if src is None or dst is None or src == dst:
+            return None
+        (src_name, src_mac), (dst_name, dst_mac) = src, dst
+
+        if kind == 'route':
+            path = topology_route(src_name, dst_name, network_topology)
+            if not path:
+                return None
+            return f"Packets from {src_name} to {dst_name} take the route {' -> '.join(path)}", False
+
+        src_switch, _ = verifier.host_attachment(src_name, src_mac, network_topology, network_state)
+        dst_switch, _ = verifier.host_attachment(dst_name, dst_mac, network_topology, network_state)
+        if src_switch is None or dst_switch is None:
+            return None
+
+        # drop rules sit at the ingress switch of the sending host; allow removes only those rules
+        directions = [(src_switch, src_mac, dst_mac)]
+        if kind.endswith('_pair'):
+            directions.append((dst_switch, dst_mac, src_mac))
+        if kind.startswith('block'):
+            return [{'action': 'install_flow', 'switch': dpid, 'src_mac': a, 'dst_mac': b, 'actions': [], 'priority': BLOCK_FLOW_PRIORITY}
+                    for dpid, a, b in directions], True
+        return [{'action': 'delete_flow', 'switch': dpid, 'src_mac': a, 'dst_mac': b, 'priority': BLOCK_FLOW_PRIORITY}
+                for dpid, a, b in directions], True
+
+    # single host intents: location
+    if kind == 'locate':
+        host = resolve_host(groups['host'], network_topology)
+        if host is None:
+            return None
+        name, mac = host
+        dpid, port = verifier.host_attachment(name, mac, network_topology, network_state)
+        if dpid is None:
+            return None
+        at_port = f', port {port}' if port is not None else ''
+        return f'Host {mac} ({name}) is located at switch {dpid}{at_port}.', False
+
+    dpid = int(groups['switch'])
+
+    # switch intents: attached hosts
+    if kind == 'list_hosts':
+        attached = [n for n in (network_topology or {}).get('switches', {}).get(f's{dpid}', []) if n.startswith('h')]
+        return f"Hosts connected to switch {dpid}: {', '.join(attached) if attached else 'none'}.", False
+
+    # port intents: check, enable, disable
+    if groups.get('all_ports'):
+        ports = switch_ports(dpid, network_topology, network_state)
+    else:
+        ports = [int(p) for p in re.findall(r'\d+', groups['ports'])]
+    if not ports:
+        return None
+    return [{'action': kind, 'switch': dpid, 'port': port} for port in ports], True
+
+
+# function to get intent compiler hit rate and estimated latency saved
+def compiler_summary():
+    with compiler_stats_lock:
+        hits, misses = compiler_stats['hits'], compiler_stats['misses']
+        llm_times = list(compiler_stats['llm_times'])
+        compile_time = compiler_stats['compile_time']
+
+    total = hits + misses
+    avg_llm = sum(llm_times) / len(llm_times) if llm_times else None
+    avg_compile = compile_time / total if total else 0.0
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 3) if total else None,
+        'avg_compile_ms': round(avg_compile * 1000, 3),
+        'avg_llm_seconds': round(avg_llm, 3) if avg_llm is not None else None,
+        'latency_saved_seconds': round(hits * (avg_llm - avg_compile), 3) if avg_llm is not None else None,
+    }
+
+
 # POST action to controller and implement
 def apply_action(action): 
     # post to controller
-    res = requests.post(f'{CONTROLLER_URL}/intent/implement', json=action)
+    res = requests.post(f'{CONTROLLER_URL}/intent/implement', json=action, timeout=CONTROLLER_TIMEOUT)
     response = res.json()
 
     # print response in readable format
@@ -261,6 +491,64 @@ def apply_action(action):
     for reply in response.get("results", []):
         print(f"{reply}\n")
 
+    return response.get("results", [])
+
+
+# check the reachability changes of proposed actions before they are applied
+def verify_proposal(action, snapshot):
+    if snapshot.get('network_state') is None:
+        raise RuntimeError('Controller state unavailable; proposed actions cannot be verified')
+    report = verifier.verify_actions(action, snapshot['topology'], snapshot['network_state'])
+    if report:
+        print(verifier.format_report(report))
+    return report
+
+
+# resolve user intent into proposed actions (or a plain answer); the fetched snapshot is stored for verification
+def resolve_intent(user_intent, snapshot=None):
+    # get context for LLM
+    topology = get_network_topology()
+    network_state = get_network_state()
+    if snapshot is not None:
+        snapshot.update(topology=topology, network_state=network_state)
+
+    # try the deterministic intent compiler first
+    started = time.monotonic()
+    compiled = compile_intent(user_intent, topology, network_state)
+    if compiled and compiled[1] and not validate_actions(compiled[0], topology, network_state):
+        compiled = None
+    with compiler_stats_lock:
+        compiler_stats['compile_time'] += time.monotonic() - started
+        compiler_stats['hits' if compiled else 'misses'] += 1
+
+    if compiled:
+        action, is_json = compiled
+        print(f'[Intent compiler] {json.dumps(action) if is_json else action}')
+        return action, is_json
+
+    # pre-screen port counters locally; purely diagnostic intents need no LLM call
+    report = diagnostics.diagnose(network_state, topology, diagnostics.previous_network_state())
+    if diagnostics.is_diagnostic_intent(user_intent):
+        if 'error' in report:
+            raise RuntimeError(report['error'])
+        answer = diagnostics.format_report(report)
+        print(answer)
+        return answer, False
+
+    started = time.monotonic()
+    result = build_query(user_intent, topology, diagnostics.compact_state(network_state, report))
+    if not result:
+        raise RuntimeError('Failed to parse JSON object from query response')
+
+    action, is_json = result
+    if action and is_json:
+        action = build_confirmation_query(user_intent, action)
+        if not action:
+            raise RuntimeError('Confirmation query returned no valid action list')
+    with compiler_stats_lock:
+        compiler_stats['llm_times'].append(time.monotonic() - started)
+    return action, is_json
+
 
 def main():
     action = None
@@ -273,14 +561,22 @@ def main():
             print("Exiting the intent agent...\n")
             break
 
-        # get context for LLM
-        topology = get_network_topology()
-        network_state = get_network_state()
+        snapshot = {}
+        try:
+            action, is_json = resolve_intent(user_intent, snapshot)
+        except Exception as e:
+            print(f'Error resolving intent: {e}')
+            continue
 
-        action, is_json = build_query(user_intent, topology, network_state)
+        stats = compiler_summary()
+        print(f"[Intent compiler] hit rate {stats['hits']}/{stats['hits'] + stats['misses']}, "
+              f"~{stats['latency_saved_seconds'] or 0}s of LLM latency saved")
 
         if action and is_json: 
-            action = build_confirmation_query(user_intent, action)
+            try:
+                verify_proposal(action, snapshot)
+            except Exception as e:
+                print(f'Error verifying proposed actions: {e}')
             doAction = input("\n\nEnter 'yes' to execute decision (otherwise return to start):\n")
 
             # if action allowed, save to history and execute
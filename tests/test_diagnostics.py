@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+import diagnostics
+
+
+def port_stats(rates):
+    return {'1': [{'port_no': i + 1, 'rx_bytes': rate, 'duration_sec': 1} for i, rate in enumerate(rates)]}
+
+
+def test_saturated_port_among_idle_ports_is_flagged():
+    z = diagnostics.robust_zscore(np.array([0.0] * 11 + [1e8]))
+    assert z[-1] > diagnostics.UTILIZATION_Z_THRESHOLD
+    assert not (z[:-1] > diagnostics.UTILIZATION_Z_THRESHOLD).any()
+
+    report = diagnostics.diagnose({'switches': [1], 'port_stats': port_stats([0] * 11 + [1e8])})
+    assert [(p['port'], p['flags']) for p in report['flagged_ports']] == [(12, ['utilization_outlier'])]
+
+
+def test_identical_rates_are_not_flagged():
+    assert not diagnostics.robust_zscore(np.full(12, 5e6)).any()
+
+
+def test_missing_controller_state_is_an_error():
+    report = diagnostics.diagnose(None, {'hosts': {'h1': {'mac': '00:00:00:00:00:01'}}})
+    assert 'unavailable' in report['error']
+    assert diagnostics.format_report(report) == f"[Diagnostics] {report['error']}"
+
+
+def test_only_explicit_health_questions_are_diagnostic():
+    assert diagnostics.is_diagnostic_intent('Are there any anomalies in the network?')
+    assert diagnostics.is_diagnostic_intent('check for errors or drops')
+    assert not diagnostics.is_diagnostic_intent('why are there drops on s2 port 4 and how do I fix them?')
+
+
+def test_health_question_without_controller_state_raises(monkeypatch):
+    import northbound_agent as agent
+
+    monkeypatch.setattr(agent, 'get_network_state', lambda: None)
+    with pytest.raises(RuntimeError, match='unavailable'):
+        agent.resolve_intent('Are there any anomalies in the network?')
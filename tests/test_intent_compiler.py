@@ -0,0 +1,106 @@
+import json
+import os
+
+import pytest
+
+import northbound_agent as agent
+
+
+TOPOLOGY_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mininet', 'topology.json')
+
+
+@pytest.fixture(scope='module')
+def topology():
+    with open(TOPOLOGY_FILE) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def state():
+    return {'switches': [1, 2, 3, 4]}
+
+
+def compile_intent(text, topology, state):
+    return agent.compile_intent(text, topology, state)
+
+
+def mac(topology, host):
+    return topology['hosts'][host]['mac']
+
+
+# phrasings that add conditions, protocols, or extra clauses the compiler cannot express
+@pytest.mark.parametrize('text', [
+    'block icmp between h1 and h6',
+    'block http traffic between h1 and h6',
+    'isolate h1 from h6 but keep arp',
+    'disable port 4 on s2 if it is congested',
+    'disable port 4 on s2 unless it is the root port',
+    'disable port 4 on s2 or port 3 on s2',
+    'is port 4 on s2 down? if so enable it',
+    'enable port 4 on s2 and check its state',
+    'disable port 4 on s2 then enable port 3 on s2',
+    'disable port 4 on s2 for 10 minutes',
+    "h1 can't communicate with h6",
+    'why can h1 not communicate with h2',
+    "don't block h1 and h2",
+    'Reconfigure flows to block all communication between hosts h3 and h4',
+    'block traffic between h1 and h9',
+])
+def test_unsupported_intents_go_to_the_llm(text, topology, state):
+    assert compile_intent(text, topology, state) is None
+
+
+def test_block_pair(topology, state):
+    actions, is_json = compile_intent('block traffic between h3 and h4', topology, state)
+    assert is_json
+    assert [(a['action'], a['switch'], a['src_mac'], a['dst_mac'], a['priority']) for a in actions] == [
+        ('install_flow', 2, mac(topology, 'h3'), mac(topology, 'h4'), agent.BLOCK_FLOW_PRIORITY),
+        ('install_flow', 3, mac(topology, 'h4'), mac(topology, 'h3'), agent.BLOCK_FLOW_PRIORITY),
+    ]
+    assert all(a['actions'] == [] for a in actions)
+
+
+def test_block_flow_is_one_directional(topology, state):
+    actions, _ = compile_intent('block traffic from h1 to h6', topology, state)
+    assert [(a['switch'], a['src_mac'], a['dst_mac']) for a in actions] == [(1, mac(topology, 'h1'), mac(topology, 'h6'))]
+
+
+def test_allow_pair_removes_only_the_drop_rules(topology, state):
+    actions, _ = compile_intent('allow traffic between h3 and h4 again', topology, state)
+    assert actions == [
+        {'action': 'delete_flow', 'switch': 2, 'src_mac': mac(topology, 'h3'), 'dst_mac': mac(topology, 'h4'), 'priority': agent.BLOCK_FLOW_PRIORITY},
+        {'action': 'delete_flow', 'switch': 3, 'src_mac': mac(topology, 'h4'), 'dst_mac': mac(topology, 'h3'), 'priority': agent.BLOCK_FLOW_PRIORITY},
+    ]
+
+
+def test_host_table_of_a_broadcast_hop_is_ignored(topology, state):
+    state['host_table'] = {mac(topology, 'h1'): {'dpid': 4, 'port': 3}}
+    answer, is_json = compile_intent('where is h1', topology, state)
+    assert not is_json
+    assert answer == f"Host {mac(topology, 'h1')} (h1) is located at switch 1, port 1."
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('disable port 4 on s2', [('block_port', 2, 4)]),
+    ('please disable ports 1 and 2 on s2', [('block_port', 2, 1), ('block_port', 2, 2)]),
+    ('Disable ports 1, 2 and 3 on switch 2.', [('block_port', 2, 1), ('block_port', 2, 2), ('block_port', 2, 3)]),
+    ('disable s2-eth3', [('block_port', 2, 3)]),
+    ('disable all ports on switch 1', [('block_port', 1, 1), ('block_port', 1, 2)]),
+    ('enable port 4 on s2', [('unblock_port', 2, 4)]),
+    ('check port 5 on s2', [('check_port_status', 2, 5)]),
+    ('can you check the status of port 3 on s2?', [('check_port_status', 2, 3)]),
+    ('is port 3 on s2 up?', [('check_port_status', 2, 3)]),
+])
+def test_port_intents(text, expected, topology, state):
+    actions, is_json = compile_intent(text, topology, state)
+    assert is_json
+    assert [(a['action'], a['switch'], a['port']) for a in actions] == expected
+
+
+@pytest.mark.parametrize('text, answer', [
+    ('where is h5', 'Host 00:00:00:00:00:05 (h5) is located at switch 3, port 2.'),
+    ('which hosts are connected to switch 3', 'Hosts connected to switch 3: h4, h5.'),
+    ('which route do packets take from h1 to h6', 'Packets from h1 to h6 take the route h1 -> s1 -> s2 -> s4 -> h6'),
+])
+def test_answers(text, answer, topology, state):
+    assert compile_intent(text, topology, state) == (answer, False)
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+from intent_service import IntentService
+
+
+ACTIONS = [{'action': 'block_port', 'switch': 9, 'port': 1}]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_submit_without_server():
+    async def scenario():
+        service = IntentService(llm_workers=1, resolve=lambda intent, snapshot: (ACTIONS, True), verify=lambda actions, snapshot: {})
+        service.start()
+        record = service.submit('disable port 1 on s9')
+        await service.queue.join()
+        return record
+
+    assert run(scenario())['status'] == 'awaiting_approval'
+
+
+def test_timed_out_apply_keeps_switch_locks():
+    spans = []
+
+    def slow_apply(actions):
+        started = time.monotonic()
+        time.sleep(0.6)
+        spans.append((started, time.monotonic()))
+        return ['ok']
+
+    async def scenario():
+        service = IntentService(apply=slow_apply, apply_timeout=0.2)
+        first = {'id': 'a', 'actions': ACTIONS, 'status': 'approved', 'latency': {}, '_t_submit': time.monotonic()}
+        second = {'id': 'b', 'actions': ACTIONS, 'status': 'approved', 'latency': {}, '_t_submit': time.monotonic()}
+        task = asyncio.ensure_future(service.apply_intent(first))
+        await asyncio.sleep(0.3)
+        assert first['status'] == 'timed_out'
+        await asyncio.gather(task, service.apply_intent(second))
+        return service, first, second
+
+    service, first, second = run(scenario())
+    assert first['status'] == 'applied' and first['results'] == ['ok'] and first['error'] is None
+    assert second['status'] == 'applied'
+    # second apply only starts after the first one has really finished
+    assert spans[1][0] >= spans[0][1]
+    # lock wait is recorded apart from the apply itself
+    assert second['latency']['lock_wait'] >= 0.2
+    assert 0.5 <= second['latency']['apply'] < 0.9
+
+
+def test_failed_apply_and_finished_eviction(monkeypatch):
+    monkeypatch.setattr('intent_service.MAX_FINISHED_INTENTS', 2)
+
+    def broken_apply(actions):
+        raise RuntimeError('controller down')
+
+    async def scenario():
+        service = IntentService(apply=broken_apply)
+        records = []
+        for intent_id in 'abc':
+            record = {'id': intent_id, 'actions': ACTIONS, 'status': 'approved', 'latency': {}, '_t_submit': time.monotonic()}
+            service.intents[intent_id] = record
+            records.append(record)
+            await service.apply_intent(record)
+        return service, records
+
+    service, records = run(scenario())
+    assert all(r['status'] == 'failed' and 'controller down' in r['error'] for r in records)
+    assert sorted(service.intents) == ['b', 'c']
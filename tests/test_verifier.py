@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+import verifier
+
+
+TOPOLOGY_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mininet', 'topology.json')
+
+
+@pytest.fixture(scope='module')
+def topology():
+    with open(TOPOLOGY_FILE) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def macs(topology):
+    return {name: host['mac'] for name, host in topology['hosts'].items()}
+
+
+def drop_rule(switch, src_mac, dst_mac):
+    return {'action': 'install_flow', 'switch': switch, 'src_mac': src_mac, 'dst_mac': dst_mac, 'actions': [], 'priority': 2}
+
+
+def test_host_table_of_a_broadcast_hop_is_ignored(topology, macs):
+    state = {'host_table': {macs['h1']: {'dpid': 4, 'port': 3}}}
+    assert verifier.host_attachment('h1', macs['h1'], topology, state) == (1, 1)
+    state = {'host_table': {macs['h1']: {'dpid': 1, 'port': 1}}}
+    assert verifier.host_attachment('h1', macs['h1'], topology, state) == (1, 1)
+
+
+def test_blocked_uplink_cuts_off_the_host(topology):
+    report = verifier.ReachabilityVerifier(topology, {}).verify([{'action': 'block_port', 'switch': 1, 'port': 2}])
+    assert verifier.pair_labels(report['lost']) == ['h1↔h2', 'h1↔h3', 'h1↔h4', 'h1↔h5', 'h1↔h6']
+
+
+def test_flow_action_only_recomputes_its_destination(topology, macs):
+    reach = verifier.ReachabilityVerifier(topology, {})
+    report = reach.verify([drop_rule(1, macs['h1'], macs['h2'])])
+    assert report['lost'] == [('h1', 'h2')]
+    assert report['pairs_recomputed'] == len(macs) - 1
+
+
+def test_wrong_output_port_and_bounce(topology, macs):
+    reach = verifier.ReachabilityVerifier(topology, {})
+    flow = {'action': 'install_flow', 'switch': 2, 'src_mac': macs['h1'], 'dst_mac': macs['h6']}
+    assert reach.verify([dict(flow, actions=[{'type': 'output', 'port': 3}])])['lost'] == [('h1', 'h6')]
+    # s2 sends towards s4, s4 sends back out of the port it came in on
+    report = reach.verify([dict(flow, actions=[{'type': 'output', 'port': 4}]),
+                           dict(flow, switch=4, actions=[{'type': 'output', 'port': 3}])])
+    assert report['lost'] == [('h1', 'h6')]
+
+
+def test_strict_delete_restores_only_the_dropped_pair(topology, macs):
+    state = {'flow_tables': {
+        '1': [{'priority': 2, 'match': {'eth_src': macs['h1'], 'eth_dst': macs['h2']}, 'actions': []},
+              {'priority': 1, 'match': {'in_port': 2, 'eth_dst': macs['h1']}, 'actions': [{'type': 'output', 'port': 1}]}],
+    }}
+    reach = verifier.ReachabilityVerifier(topology, state)
+    assert ('h1', 'h2') in reach.verify([])['unreachable_before']
+    report = reach.verify([{'action': 'delete_flow', 'switch': 1, 'src_mac': macs['h1'], 'dst_mac': macs['h2'], 'priority': 2}])
+    assert report['restored'] == [('h1', 'h2')] and report['lost'] == []
+
+    model = verifier.NetworkModel(topology, state)
+    model.apply({'action': 'delete_flow', 'switch': 1, 'src_mac': macs['h1'], 'dst_mac': macs['h2'], 'priority': 2})
+    assert model.flows[1][macs['h1']] == [(1, {'in_port': 2, 'eth_dst': macs['h1']}, [1])]
+
+
+def test_snapshot_update_is_scoped(topology, macs):
+    reach = verifier.ReachabilityVerifier(topology, {})
+    assert reach.update(topology, {})['destinations_recomputed'] == 0
+
+    flows = {'flow_tables': {'2': [{'priority': 2, 'match': {'eth_src': macs['h1'], 'eth_dst': macs['h6']}, 'actions': []}]}}
+    assert reach.update(topology, flows)['destinations_recomputed'] == 1
+    assert not reach.results['h6']['h1'][0]
+
+    port_down = dict(flows, port_description_stats={'4': [{'port_no': 1, 'config': 1, 'state': 0}]})
+    assert reach.update(topology, port_down)['destinations_recomputed'] == len(macs)
+
+
+def test_proposal_is_verified_against_the_resolved_snapshot(monkeypatch, topology, macs):
+    import northbound_agent as agent
+
+    def no_fetch():
+        raise AssertionError('verify_proposal must not fetch a new snapshot')
+
+    monkeypatch.setattr(agent, 'get_network_state', no_fetch)
+    monkeypatch.setattr(verifier, 'verifier_cache', {'verifier': None})
+    report = agent.verify_proposal([drop_rule(1, macs['h1'], macs['h2'])], {'topology': topology, 'network_state': {}})
+    assert report['lost'] == [('h1', 'h2')]
+
+    with pytest.raises(RuntimeError, match='unavailable'):
+        agent.verify_proposal([drop_rule(1, macs['h1'], macs['h2'])], {'topology': topology, 'network_state': None})
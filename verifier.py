@@ -0,0 +1,497 @@
+from collections import deque
+import ast
+import copy
+import re
+import threading
+import time
+
+
+# openflow / stplib constants used by the forwarding model
+OFPP_MAX = 0xffffff00
+OFPP_IN_PORT = 0xfffffff8
+OFPP_FLOOD = 0xfffffffb
+OFPP_ALL = 0xfffffffc
+OFPP_CONTROLLER = 0xfffffffd
+OFPPC_PORT_DOWN = 1
+OFPPS_LINK_DOWN = 1
+STP_BLOCKING_STATES = (0, 1)  # stplib PORT_STATE_DISABLE, PORT_STATE_BLOCK
+
+# actions that change forwarding (others are read-only and need no verification)
+MODIFYING_ACTIONS = ('install_flow', 'delete_flow', 'block_port', 'unblock_port')
+
+
+# parse the oxm fields of a flow match string, e.g. "OFPMatch(oxm_fields={'eth_dst': '...'})"
+def parse_match(match):
+    if isinstance(match, dict):
+        return match
+    found = re.search(r'oxm_fields=(\{.*\})', match or '')
+    if not found:
+        return None
+    try:
+        return ast.literal_eval(found.group(1))
+    except (ValueError, SyntaxError):
+        return None
+
+
+# get per-switch entries of a snapshot section; json turns dpid keys into strings
+def per_switch(network_state, section):
+    return {int(dpid): entries for dpid, entries in ((network_state or {}).get(section) or {}).items()}
+
+
+# get the (dpid, port) a host is attached to; host_table is only trusted on host-facing ports
+# (the controller overwrites it with the last switch a broadcast from the host reached)
+def host_attachment(name, mac, network_topology, network_state):
+    topology = network_topology or {}
+    port_maps = topology.get('ports', {})
+
+    location = ((network_state or {}).get('host_table') or {}).get(mac)
+    if location:
+        dpid, port = int(location['dpid']), int(location['port'])
+        if port_maps.get(f's{dpid}', {}).get(str(port), '').startswith('h'):
+            return dpid, port
+
+    for switch, port_map in port_maps.items():
+        for port, neighbour in port_map.items():
+            if neighbour == name:
+                return int(switch.lstrip('s')), int(port)
+
+    # topology files without a port map only know the switch
+    for switch, neighbours in topology.get('switches', {}).items():
+        if name in neighbours:
+            return int(switch.lstrip('s')), None
+    return None, None
+
+
+# forwarding model of the network (flow tables, stp port states, port states, links)
+class NetworkModel:
+    def __init__(self, network_topology, network_state):
+        topology = network_topology or {}
+        # links: (dpid, port) -> ('host', name) or ('switch', (peer_dpid, peer_port))
+        self.links = {}
+        ports = {int(s.lstrip('s')): {int(p): n for p, n in m.items()} for s, m in topology.get('ports', {}).items()}
+        for dpid, port_map in ports.items():
+            for port, neighbour in port_map.items():
+                if neighbour.startswith('h'):
+                    self.links[(dpid, port)] = ('host', neighbour)
+                else:
+                    peer = int(neighbour.lstrip('s'))
+                    peer_port = next((p for p, n in ports.get(peer, {}).items() if n == f's{dpid}'), None)
+                    if peer_port is not None:
+                        self.links[(dpid, port)] = ('switch', (peer, peer_port))
+
+        # host attachment (hosts without a known port cannot be traced)
+        self.hosts = {}
+        for name, host in topology.get('hosts', {}).items():
+            dpid, port = host_attachment(name, host.get('mac'), topology, network_state)
+            if port is not None:
+                self.hosts[name] = (host['mac'], (dpid, port))
+                self.links[(dpid, port)] = ('host', name)
+        self.host_by_mac = {mac: name for name, (mac, _) in self.hosts.items()}
+
+        # ports of each switch, and inter-switch links only (used when flooding)
+        self.switch_ports = {}
+        self.switch_links = {}
+        for (dpid, port), (kind, target) in sorted(self.links.items()):
+            self.switch_ports.setdefault(dpid, []).append(port)
+            if kind == 'switch':
+                self.switch_links.setdefault(dpid, []).append((port, target))
+
+        # ports that cannot forward: admin / link down or stp blocked
+        self.ports_down = set()
+        for dpid, descs in per_switch(network_state, 'port_description_stats').items():
+            for desc in descs or []:
+                if (int(desc.get('config', 0) or 0) & OFPPC_PORT_DOWN) or (int(desc.get('state', 0) or 0) & OFPPS_LINK_DOWN):
+                    self.ports_down.add((dpid, int(desc['port_no'])))
+        self.stp_blocked = set()
+        for dpid, states in per_switch(network_state, 'stp_port_states').items():
+            for port, stp_state in (states or {}).items():
+                if int(stp_state) in STP_BLOCKING_STATES:
+                    self.stp_blocked.add((dpid, int(port)))
+
+        # flow tables: dpid -> {eth_dst (None if wildcard): [(priority, match fields, output ports)]}
+        self.flows = {}
+        for dpid, flows in per_switch(network_state, 'flow_tables').items():
+            for flow in flows or []:
+                fields = parse_match(flow.get('match'))
+                if fields is None:
+                    continue
+                outputs = [int(a['port']) for a in flow.get('actions', []) if (a.get('type') or 'output') == 'output']
+                self.add_flow(dpid, int(flow.get('priority', 0)), fields, outputs)
+
+        self.mac_table = {dpid: {mac: int(port) for mac, port in (table or {}).items()}
+                          for dpid, table in per_switch(network_state, 'mac_table').items()}
+
+    # add a flow entry to the model, keeping each bucket sorted by descending priority
+    def add_flow(self, dpid, priority, fields, outputs):
+        bucket = self.flows.setdefault(dpid, {}).setdefault(fields.get('eth_dst'), [])
+        bucket.append((priority, fields, outputs))
+        bucket.sort(key=lambda f: -f[0])
+
+    # check whether a port can send / receive packets
+    def usable(self, dpid, port):
+        return (dpid, port) not in self.ports_down and (dpid, port) not in self.stp_blocked
+
+    # get the switch at the other end of a port (if any)
+    def peer_switch(self, dpid, port):
+        kind, target = self.links.get((dpid, port), (None, None))
+        return target[0] if kind == 'switch' else None
+
+    # get egress ports for a packet at a switch (flow table first, controller learning switch on miss)
+    def egress(self, dpid, in_port, src_mac, dst_mac):
+        packet = {'in_port': in_port, 'eth_src': src_mac, 'eth_dst': dst_mac}
+        table = self.flows.get(dpid, {})
+
+        # highest priority match among flows for this destination and wildcard-destination flows
+        best = None
+        for bucket in (table.get(dst_mac, ()), table.get(None, ())):
+            for entry in bucket:
+                if best is not None and entry[0] <= best[0]:
+                    break
+                # fields not modelled here (eth_type, ip, ...) are assumed to match
+                if all(packet[k] == v for k, v in entry[1].items() if k in packet):
+                    best = entry
+                    break
+
+        if best is not None and OFPP_CONTROLLER not in best[2]:
+            return best[2]
+
+        # packet_in: forward to learned port, otherwise flood
+        learned = self.mac_table.get(dpid, {}).get(dst_mac)
+        return [learned] if learned is not None else [OFPP_FLOOD]
+
+    # trace a packet from src host to dst host; returns (delivered, loop, touched switches)
+    def trace(self, src, dst):
+        src_mac, (dpid, port) = self.hosts[src]
+        dst_mac = self.hosts[dst][0]
+        delivered, loop = False, False
+        touched = set()
+        visited = set()
+        stack = [(dpid, port)]
+
+        while stack:
+            dpid, in_port = stack.pop()
+            touched.add(dpid)
+            if (dpid, in_port) in visited:
+                loop = True
+                continue
+            visited.add((dpid, in_port))
+            if not self.usable(dpid, in_port):
+                continue
+
+            out_ports = []
+            for out in self.egress(dpid, in_port, src_mac, dst_mac):
+                if out in (OFPP_FLOOD, OFPP_ALL):
+                    out_ports.extend(p for p in self.switch_ports.get(dpid, ()) if p != in_port)
+                elif out == OFPP_IN_PORT:
+                    out_ports.append(in_port)
+                elif out <= OFPP_MAX and out != in_port:
+                    out_ports.append(out)
+
+            for out in out_ports:
+                if not self.usable(dpid, out):
+                    continue
+                kind, target = self.links.get((dpid, out), (None, None))
+                if kind == 'host':
+                    delivered = delivered or target == dst
+                elif kind == 'switch':
+                    stack.append(target)
+
+        return delivered, loop, touched
+
+    # check whether any flow that can match packets to dst_mac also matches on the source
+    def src_dependent(self, dst_mac):
+        for table in self.flows.values():
+            for bucket in (table.get(dst_mac, ()), table.get(None, ())):
+                if any('eth_src' in fields for _, fields, _ in bucket):
+                    return True
+        return False
+
+    # reachability of one destination host from every other host
+    # returns ({src: (delivered, loop)}, touched switches)
+    def reach_to(self, dst):
+        dst_mac, dst_port = self.hosts[dst]
+        sources = [h for h in self.hosts if h != dst]
+
+        # flows matching on eth_src need a trace per source
+        if self.src_dependent(dst_mac):
+            results, touched = {}, set()
+            for src in sources:
+                delivered, loop, switches = self.trace(src, dst)
+                results[src] = (delivered, loop)
+                touched |= switches
+            return results, touched
+
+        # otherwise forwarding only depends on (switch, in_port): explore that graph once
+        succ, delivering = {}, set()
+        stack = [self.hosts[src][1] for src in sources]
+        while stack:
+            node = stack.pop()
+            if node in succ:
+                continue
+            succ[node] = []
+            dpid, in_port = node
+            if not self.usable(dpid, in_port):
+                continue
+
+            out_ports = []
+            for out in self.egress(dpid, in_port, None, dst_mac):
+                if out in (OFPP_FLOOD, OFPP_ALL):
+                    # only the destination's own port and inter-switch links matter for a flood
+                    if dst_port[0] == dpid and dst_port[1] != in_port:
+                        out_ports.append(dst_port[1])
+                    out_ports.extend(p for p, _ in self.switch_links.get(dpid, ()) if p != in_port)
+                elif out == OFPP_IN_PORT:
+                    out_ports.append(in_port)
+                elif out <= OFPP_MAX and out != in_port:
+                    out_ports.append(out)
+
+            for out in out_ports:
+                if not self.usable(dpid, out):
+                    continue
+                kind, target = self.links.get((dpid, out), (None, None))
+                if kind == 'host' and target == dst:
+                    delivering.add(node)
+                elif kind == 'switch':
+                    succ[node].append(target)
+                    stack.append(target)
+
+        pred = {}
+        for node, nexts in succ.items():
+            for n in nexts:
+                pred.setdefault(n, []).append(node)
+
+        # nodes that can deliver: reverse search from delivering nodes
+        can_deliver = set(delivering)
+        queue = deque(delivering)
+        while queue:
+            for p in pred.get(queue.popleft(), ()):
+                if p not in can_deliver:
+                    can_deliver.add(p)
+                    queue.append(p)
+
+        # nodes that reach a forwarding loop: whatever remains after peeling nodes without successors
+        out_degree = {node: len(nexts) for node, nexts in succ.items()}
+        queue = deque(node for node, degree in out_degree.items() if degree == 0)
+        while queue:
+            node = queue.popleft()
+            del out_degree[node]
+            for p in pred.get(node, ()):
+                out_degree[p] -= 1
+                if out_degree[p] == 0:
+                    queue.append(p)
+
+        results = {}
+        for src in sources:
+            start = self.hosts[src][1]
+            results[src] = (start in can_deliver, start in out_degree)
+        return results, {dpid for dpid, _ in succ}
+
+    # differences at one switch against another model: (port states changed, destination macs whose flows / mac entries changed)
+    # a changed wildcard-destination flow shows up as None in the macs
+    def switch_changes(self, other, dpid):
+        ports_changed = (
+            {p for d, p in self.ports_down if d == dpid} != {p for d, p in other.ports_down if d == dpid}
+            or {p for d, p in self.stp_blocked if d == dpid} != {p for d, p in other.stp_blocked if d == dpid}
+        )
+        macs = set()
+        for mine, theirs in ((self.flows.get(dpid, {}), other.flows.get(dpid, {})),
+                             (self.mac_table.get(dpid, {}), other.mac_table.get(dpid, {}))):
+            if mine != theirs:
+                macs |= {mac for mac in set(mine) | set(theirs) if mine.get(mac) != theirs.get(mac)}
+        return ports_changed, macs
+
+    # destination hosts of a set of macs (unknown macs carry no host traffic)
+    def destinations_of(self, macs):
+        return {self.host_by_mac[mac] for mac in macs if mac in self.host_by_mac}
+
+    # copy of the model; only flow tables and port states are changed by actions
+    def copy(self):
+        model = copy.copy(self)
+        model.flows = {dpid: {dst: list(bucket) for dst, bucket in table.items()} for dpid, table in self.flows.items()}
+        model.ports_down = set(self.ports_down)
+        return model
+
+    # apply one proposed action to the model
+    # returns (switches whose forwarding changed for every destination, destination hosts whose forwarding changed)
+    def apply(self, action):
+        action_type = action.get('action')
+        if action_type not in MODIFYING_ACTIONS:
+            return set(), set()
+        dpid = int(action['switch'])
+
+        if action_type == 'install_flow':
+            outputs = [int(a['port']) for a in action.get('actions') or [] if (a.get('type') or '').lower() == 'output' and a.get('port') is not None]
+            if not outputs and action.get('out_port') is not None:
+                outputs = [int(action['out_port'])]
+            fields = {'eth_src': action['src_mac'], 'eth_dst': action['dst_mac']}
+            self.add_flow(dpid, int(action.get('priority', 1)), fields, outputs)
+            # flows match on eth_dst, so only traffic to that host changes
+            return set(), self.destinations_of([action['dst_mac']])
+
+        if action_type == 'delete_flow':
+            table = self.flows.get(dpid, {})
+            if action.get('src_mac') and action.get('dst_mac'):
+                # strict delete: only the flow with exactly this match and priority
+                fields = {'eth_src': action['src_mac'], 'eth_dst': action['dst_mac']}
+                priority = int(action.get('priority', 1))
+                bucket = table.get(action['dst_mac'], [])
+                bucket[:] = [f for f in bucket if not (f[0] == priority and f[1] == fields)]
+                return set(), self.destinations_of([action['dst_mac']])
+
+            # controller deletes every flow matching a learned destination mac
+            for mac in self.mac_table.get(dpid, {}):
+                table.pop(mac, None)
+            return {dpid}, set()
+
+        port = int(action['port'])
+        if action_type == 'block_port':
+            self.ports_down.add((dpid, port))
+        else:
+            self.ports_down.discard((dpid, port))
+        peer = self.peer_switch(dpid, port)
+        return ({dpid} if peer is None else {dpid, peer}), set()
+
+
+# reachability matrix between all host pairs, kept per destination and updated incrementally
+class ReachabilityVerifier:
+    def __init__(self, network_topology, network_state):
+        started = time.monotonic()
+        self.model = NetworkModel(network_topology, network_state)
+        self.results = {}    # dst -> {src: (delivered, loop)}
+        self.touched = {}    # dst -> switches its traffic can cross
+        self.by_switch = {}  # dpid -> destinations whose traffic can cross the switch
+        for dst in self.model.hosts:
+            self.store(dst, *self.model.reach_to(dst))
+        self.last_update = {'kind': 'full', 'destinations_recomputed': len(self.results),
+                            'elapsed_ms': round((time.monotonic() - started) * 1000, 2)}
+
+    # store results of one destination and index the switches it depends on
+    def store(self, dst, results, touched):
+        for dpid in self.touched.get(dst, ()):
+            self.by_switch[dpid].discard(dst)
+        self.results[dst] = results
+        self.touched[dst] = touched
+        for dpid in touched:
+            self.by_switch.setdefault(dpid, set()).add(dst)
+
+    # destinations whose reachability can change if the given switches change
+    def affected_destinations(self, switches):
+        destinations = set()
+        for dpid in switches:
+            destinations |= self.by_switch.get(dpid, set())
+        return destinations
+
+    # function to move the baseline to a new snapshot; only destinations whose forwarding can have changed are recomputed
+    def update(self, network_topology, network_state):
+        started = time.monotonic()
+        model = NetworkModel(network_topology, network_state)
+        if model.hosts != self.model.hosts or model.links != self.model.links:
+            self.__init__(network_topology, network_state)
+            return self.last_update
+
+        # port state changes affect every destination crossing the switch; flow / mac changes only their destination
+        switches, macs = set(), set()
+        for dpid in set(model.switch_ports) | set(self.model.switch_ports):
+            ports_changed, changed_macs = model.switch_changes(self.model, dpid)
+            if ports_changed or None in changed_macs:
+                switches.add(dpid)
+            macs |= changed_macs
+        destinations = self.affected_destinations(switches) | model.destinations_of(macs)
+        for dst in destinations:
+            self.store(dst, *model.reach_to(dst))
+        self.model = model
+
+        self.last_update = {'kind': 'incremental', 'destinations_recomputed': len(destinations),
+                            'elapsed_ms': round((time.monotonic() - started) * 1000, 2)}
+        return self.last_update
+
+    # function to compute reachability changes caused by a list of proposed actions
+    def verify(self, actions):
+        started = time.monotonic()
+        model = self.model.copy()
+        switches, destinations = set(), set()
+        for action in actions or []:
+            changed_switches, changed_destinations = model.apply(action)
+            switches |= changed_switches
+            destinations |= changed_destinations
+
+        # flow actions only change their destination; port actions every destination crossing the switch
+        lost, restored, loops_introduced, loops_removed = [], [], [], []
+        destinations |= self.affected_destinations(switches)
+        for dst in sorted(destinations):
+            results, _ = model.reach_to(dst)
+            for src, (delivered, loop) in sorted(results.items()):
+                was_delivered, was_loop = self.results[dst][src]
+                if was_delivered and not delivered:
+                    lost.append((src, dst))
+                elif delivered and not was_delivered:
+                    restored.append((src, dst))
+                if loop and not was_loop:
+                    loops_introduced.append((src, dst))
+                elif was_loop and not loop:
+                    loops_removed.append((src, dst))
+
+        hosts = len(self.results)
+        return {
+            'lost': lost,
+            'restored': restored,
+            'loops_introduced': loops_introduced,
+            'loops_removed': loops_removed,
+            'unreachable_before': sorted((src, dst) for dst, results in self.results.items() for src, r in results.items() if not r[0]),
+            'pairs_recomputed': len(destinations) * max(hosts - 1, 0),
+            'pairs_total': hosts * max(hosts - 1, 0),
+            'elapsed_ms': round((time.monotonic() - started) * 1000, 2),
+        }
+
+
+# group directed pairs into "a↔b" (both directions) and "a→b" (one direction) labels
+def pair_labels(pairs):
+    pairs = set(pairs)
+    labels = []
+    for src, dst in sorted(pairs):
+        if (dst, src) in pairs:
+            if src < dst:
+                labels.append(f'{src}↔{dst}')
+        else:
+            labels.append(f'{src}→{dst}')
+    return labels
+
+
+# format the verification report as readable lines
+def format_report(report):
+    lines = [f"[Verifier] {report['pairs_recomputed']}/{report['pairs_total']} host pairs recomputed in {report['elapsed_ms']} ms"]
+    if 'baseline' in report:
+        baseline = report['baseline']
+        lines[0] += (f" ({baseline['kind']} baseline update: {baseline['destinations_recomputed']} destinations "
+                     f"in {baseline['elapsed_ms']} ms; {report['total_ms']} ms total)")
+    for key, text in (('lost', 'lost'), ('restored', 'restored'), ('loops_introduced', 'loop introduced'), ('loops_removed', 'loop removed')):
+        for label in pair_labels(report[key]):
+            lines.append(f'- {label} {text}')
+    if len(lines) == 1:
+        lines.append('- No reachability changes between hosts.')
+    return '\n'.join(lines)
+
+
+# cached verifier; moved to each new snapshot incrementally instead of rebuilt per proposal
+verifier_cache = {'verifier': None}
+verifier_lock = threading.Lock()
+
+
+# function to verify proposed actions against a network snapshot
+def verify_actions(actions, network_topology, network_state):
+    if not any(isinstance(a, dict) and a.get('action') in MODIFYING_ACTIONS for a in actions or []):
+        return None
+
+    with verifier_lock:
+        verifier = verifier_cache['verifier']
+        if verifier is None:
+            verifier = verifier_cache['verifier'] = ReachabilityVerifier(network_topology, network_state)
+            baseline = verifier.last_update
+        else:
+            baseline = verifier.update(network_topology, network_state)
+        report = verifier.verify(actions)
+
+    # end-to-end cost includes moving the baseline to this snapshot
+    report['baseline'] = baseline
+    report['total_ms'] = round(baseline['elapsed_ms'] + report['elapsed_ms'], 2)
+    return report